@@ -1,9 +1,22 @@
+import os
+import json
+import time
+import uuid
 import streamlit as st
 import sqlite3
 import pandas as pd
 from datetime import date, datetime, timedelta
 
-DB_PATH = "boutique.db"
+import reports
+import sync
+
+# BOUTIQUE_DB lets tools (e.g. loadtest.py) point the app at another file
+DB_PATH = os.environ.get("BOUTIQUE_DB", "boutique.db")
+
+# Terminal mode: BOUTIQUE_DB is this device's local replica, writes are queued
+# in its outbox and shipped to BOUTIQUE_CENTRAL_DB by sync.py
+TERMINAL_ID = os.environ.get("BOUTIQUE_TERMINAL")
+CENTRAL_DB_PATH = os.environ.get("BOUTIQUE_CENTRAL_DB")
 
 STAGES = [
     "With Mom",
@@ -20,8 +33,8 @@ STAGES = [
 ]
 
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+def get_conn(path=None):
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -36,8 +49,49 @@ def ensure_order_number_column(conn):
         conn.commit()
 
 
-def init_db():
-    conn = get_conn()
+def ensure_row_version_column(conn):
+    """Add row_version column if it's missing (used by sync to pull deltas)."""
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(orders)")
+    cols = [row["name"] for row in cur.fetchall()]
+    if "row_version" not in cols:
+        cur.execute("ALTER TABLE orders ADD COLUMN row_version INTEGER DEFAULT 0")
+        conn.commit()
+
+
+def backfill_row_versions(conn):
+    """Version and stamp orders from before the migration (or inserted without
+    a version) so terminals pull them. Only writes when there is work to do:
+    init_db runs on every rerun and must not take the write lock."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT 1 FROM orders WHERE row_version = 0 OR row_version IS NULL LIMIT 1"
+    )
+    if cur.fetchone() is None:
+        return
+
+    for field in sync.SYNCED_ORDER_FIELDS:
+        cur.execute(
+            """
+            INSERT OR IGNORE INTO order_field_clock (order_id, field, changed_at, device_id)
+            SELECT id, ?, COALESCE(last_updated, ''), 'central' FROM orders
+            WHERE row_version = 0 OR row_version IS NULL
+            """,
+            (field,),
+        )
+    # fresh, distinct versions above the current max
+    cur.execute(
+        """
+        UPDATE orders
+        SET row_version = (SELECT COALESCE(MAX(row_version), 0) FROM orders) + id
+        WHERE row_version = 0 OR row_version IS NULL
+        """
+    )
+    conn.commit()
+
+
+def init_db(path=None):
+    conn = get_conn(path)
     cur = conn.cursor()
 
     # Orders table (id is internal, order_number is your slip number)
@@ -62,8 +116,12 @@ def init_db():
         """
     )
 
-    # make sure order_number column exists in older DBs
+    # make sure order_number / row_version columns exist in older DBs
     ensure_order_number_column(conn)
+    ensure_row_version_column(conn)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_orders_row_version ON orders (row_version)"
+    )
 
     # Staff table
     cur.execute(
@@ -91,6 +149,61 @@ def init_db():
         )
         """
     )
+    # range reports / performance tabs filter on work_date
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_worklog_work_date ON worklog (work_date)"
+    )
+
+    # Sync tables (see sync.py). Every DB has them so replicas share the schema.
+    # Latest timestamp written per order field, for last-writer-wins merges
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS order_field_clock (
+            order_id INTEGER,
+            field TEXT,
+            changed_at TEXT,
+            device_id TEXT,
+            PRIMARY KEY (order_id, field)
+        )
+        """
+    )
+
+    # Changes made on a terminal that are not yet shipped to the central DB
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            change_id TEXT UNIQUE,
+            device_id TEXT,
+            op TEXT,
+            order_id INTEGER,
+            payload TEXT,
+            changed_at TEXT
+        )
+        """
+    )
+
+    # Change ids already applied here, so re-sent batches are no-ops
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS applied_changes (
+            change_id TEXT PRIMARY KEY,
+            applied_at TEXT
+        )
+        """
+    )
+
+    # Sync bookkeeping (pull watermark, last sync time)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """
+    )
+
+    backfill_row_versions(conn)
 
     conn.commit()
     conn.close()
@@ -134,6 +247,37 @@ def bool_to_int(b):
     return 1 if b else 0
 
 
+def stamp_order_field(cur, order_id, field, changed_at, device_id=None):
+    """Remember when an order field was last written (for sync conflicts)."""
+    cur.execute(
+        """
+        INSERT OR REPLACE INTO order_field_clock (order_id, field, changed_at, device_id)
+        VALUES (?, ?, ?, ?)
+        """,
+        (order_id, field, changed_at, device_id or TERMINAL_ID or "central"),
+    )
+
+
+def record_change(cur, op, order_id, payload, changed_at):
+    """Queue a change in the outbox when running as a terminal."""
+    if not TERMINAL_ID:
+        return
+    cur.execute(
+        """
+        INSERT INTO outbox (change_id, device_id, op, order_id, payload, changed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            f"{TERMINAL_ID}:{uuid.uuid4().hex}",
+            TERMINAL_ID,
+            op,
+            order_id,
+            json.dumps(payload),
+            changed_at,
+        ),
+    )
+
+
 def get_staff(role=None):
     conn = get_conn()
     if role:
@@ -183,14 +327,14 @@ def insert_order(
     cur = conn.cursor()
     now = datetime.now().isoformat(timespec="seconds")
     cur.execute(
-        """
+        f"""
         INSERT INTO orders (
             order_number,
             client_name, phone, order_date, due_date,
             needs_dyeing, needs_embroidery, needs_market,
             master_assigned, tailor_assigned,
-            current_stage, comments, last_updated
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            current_stage, comments, last_updated, row_version
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {sync.NEXT_ROW_VERSION})
         """,
         (
             order_number,
@@ -208,6 +352,11 @@ def insert_order(
             now,
         ),
     )
+    # stamp synced fields so terminal changes compare against them, not
+    # against last_updated (which any field bumps)
+    order_id = cur.lastrowid
+    for field in sync.SYNCED_ORDER_FIELDS:
+        stamp_order_field(cur, order_id, field, now)
     conn.commit()
     conn.close()
 
@@ -217,9 +366,18 @@ def update_order_stage(order_id, new_stage):
     cur = conn.cursor()
     now = datetime.now().isoformat(timespec="seconds")
     cur.execute(
-        "UPDATE orders SET current_stage = ?, last_updated = ? WHERE id = ?",
+        f"UPDATE orders SET current_stage = ?, last_updated = ?, "
+        f"row_version = {sync.NEXT_ROW_VERSION} WHERE id = ?",
         (new_stage, now, order_id),
     )
+    stamp_order_field(cur, order_id, "current_stage", now)
+    record_change(
+        cur,
+        "set_field",
+        order_id,
+        {"field": "current_stage", "value": new_stage},
+        now,
+    )
     conn.commit()
     conn.close()
 
@@ -229,9 +387,18 @@ def update_order_tailor(order_id, tailor_name):
     cur = conn.cursor()
     now = datetime.now().isoformat(timespec="seconds")
     cur.execute(
-        "UPDATE orders SET tailor_assigned = ?, last_updated = ? WHERE id = ?",
+        f"UPDATE orders SET tailor_assigned = ?, last_updated = ?, "
+        f"row_version = {sync.NEXT_ROW_VERSION} WHERE id = ?",
         (tailor_name, now, order_id),
     )
+    stamp_order_field(cur, order_id, "tailor_assigned", now)
+    record_change(
+        cur,
+        "set_field",
+        order_id,
+        {"field": "tailor_assigned", "value": tailor_name},
+        now,
+    )
     conn.commit()
     conn.close()
 
@@ -246,6 +413,19 @@ def log_work(work_date, order_id, staff_name, role, work_type, notes):
         """,
         (work_date, order_id, staff_name, role, work_type, notes),
     )
+    record_change(
+        cur,
+        "log_work",
+        order_id,
+        {
+            "work_date": work_date,
+            "staff_name": staff_name,
+            "role": role,
+            "work_type": work_type,
+            "notes": notes,
+        },
+        datetime.now().isoformat(timespec="seconds"),
+    )
     conn.commit()
     conn.close()
 
@@ -281,6 +461,30 @@ def get_work_in_range(start_date, end_date):
     return df
 
 
+def sync_sidebar():
+    """Sidebar block for terminal mode: pending changes and a sync button."""
+    st.sidebar.subheader(f"Terminal: {TERMINAL_ID}")
+    conn = get_conn()
+    status = sync.sync_status(conn)
+    conn.close()
+    st.sidebar.write(
+        f"Pending changes: **{status['pending']}** "
+        f"| Last sync: {status['last_sync'] or 'never'}"
+    )
+    if not CENTRAL_DB_PATH:
+        st.sidebar.warning("BOUTIQUE_CENTRAL_DB is not set, cannot sync.")
+    elif st.sidebar.button("Sync now"):
+        try:
+            result = sync.sync(DB_PATH, CENTRAL_DB_PATH)
+        except sqlite3.Error as e:
+            st.sidebar.warning(f"Sync failed, will retry later: {e}")
+        else:
+            st.sidebar.success(
+                f"Sent {result['pushed']} changes, "
+                f"got {result['orders']} order updates ✅"
+            )
+
+
 def main():
     st.set_page_config(page_title="Boutique Production System", layout="wide")
     st.title("🧵 Boutique Production System")
@@ -295,7 +499,19 @@ def main():
         "Masters Performance",
         "Tailors Performance",
         "Dashboard",
+        "Payroll Report",
     ]
+    if TERMINAL_ID:
+        # orders are created at the front desk; terminals only update / log.
+        # Terminals don't pull the work log, so shop-wide numbers are hidden.
+        for p in [
+            "New Order",
+            "Masters Performance",
+            "Tailors Performance",
+            "Payroll Report",
+        ]:
+            pages.remove(p)
+        sync_sidebar()
     page = st.sidebar.radio("Navigate", pages)
 
     if page == "New Order":
@@ -715,6 +931,51 @@ def main():
             )
             st.dataframe(stage_counts)
 
+    elif page == "Payroll Report":
+        st.header("Payroll Report (piece counts)")
+        st.caption(
+            "Distinct orders per staff, same rules as the performance tabs. "
+            "Reports run in the background; reopening the same range is instant."
+        )
+
+        col1, col2 = st.columns(2)
+        start_date = col1.date_input(
+            "Start date", value=date.today().replace(day=1), key="payroll_start"
+        )
+        end_date = col2.date_input("End date", value=date.today(), key="payroll_end")
+
+        if start_date > end_date:
+            st.error("Start date cannot be after end date.")
+        else:
+            if st.button("Generate report"):
+                job = reports.submit_report(
+                    DB_PATH, "payroll", start_date.isoformat(), end_date.isoformat()
+                )
+                st.session_state["payroll_job"] = job.id
+
+            job_id = st.session_state.get("payroll_job")
+            job = reports.get_job(job_id) if job_id else None
+
+            if job is None:
+                st.info("Pick a range and click 'Generate report'.")
+            elif job.status == "failed":
+                st.error(f"Report failed: {job.error}")
+            elif not job.finished:
+                st.progress(job.progress, text=f"Building report… {job.progress:.0%}")
+                # poll without blocking other sessions; the work is in the pool
+                time.sleep(1)
+                st.rerun()
+            else:
+                report_start, report_end = job.key[2:4]
+                st.subheader(f"Piece counts {report_start} → {report_end}")
+                st.dataframe(job.result)
+                st.download_button(
+                    "Download CSV",
+                    job.result.to_csv(index=False).encode("utf-8"),
+                    file_name=f"payroll_{report_start}_{report_end}.csv",
+                    mime="text/csv",
+                )
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,414 @@
+"""Load-test harness for app.py.
+
+Drives N concurrent simulated sessions (Streamlit AppTest) through a mix of
+realistic actions against a generated local database and writes a JSON
+report with throughput, p50/p99 latency per action and error counts.
+
+Each session runs in its own process by default. Several AppTest sessions
+running in threads of one process can silently drop form submissions, so
+--mode thread is only useful for quick smoke runs. Write actions count as ok
+only when the app shows its success message; otherwise they are reported as
+"unconfirmed".
+
+Example:
+    python loadtest.py --sessions 8 --actions 25 --report loadtest.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Default action mix (relative weights), roughly a busy Saturday
+DEFAULT_MIX = {
+    "new_order": 2,
+    "update_stage": 4,
+    "log_work": 5,
+    "dashboard": 3,
+    "masters_performance": 1,
+    "tailors_performance": 1,
+}
+
+
+class ScriptError(Exception):
+    """An exception raised inside the app script during a run."""
+
+
+class NotConfirmed(Exception):
+    """A write action finished without the app's success message."""
+
+
+def build_database(db_path, orders=500, days=60, entries_per_day=40, seed=0):
+    """Create a fresh database at db_path filled with generated data."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.environ["BOUTIQUE_DB"] = db_path
+
+    import app
+
+    app.DB_PATH = db_path
+    app.init_db()
+    app.seed_staff()
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    staff = conn.execute("SELECT name, role FROM staff").fetchall()
+    masters = [name for name, role in staff if role == "Master"]
+    tailors = [name for name, role in staff if role == "Tailor"]
+    today = date.today()
+    now = datetime.now().isoformat(timespec="seconds")
+
+    order_rows = []
+    for i in range(orders):
+        order_date = today - timedelta(days=rng.randrange(days))
+        due_date = order_date + timedelta(days=rng.randrange(7, 45))
+        order_rows.append(
+            (
+                f"LT-{i + 1}",
+                f"Client {i + 1}",
+                f"9{rng.randrange(10**9):09d}",
+                order_date.isoformat(),
+                due_date.isoformat(),
+                rng.randrange(2),
+                rng.randrange(2),
+                rng.randrange(2),
+                rng.choice(masters),
+                rng.choice(tailors + [None]),
+                rng.choice(app.STAGES),
+                "",
+                now,
+            )
+        )
+    conn.executemany(
+        """
+        INSERT INTO orders (
+            order_number,
+            client_name, phone, order_date, due_date,
+            needs_dyeing, needs_embroidery, needs_market,
+            master_assigned, tailor_assigned,
+            current_stage, comments, last_updated
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        order_rows,
+    )
+
+    work_rows = []
+    for d in range(days):
+        work_date = (today - timedelta(days=d)).isoformat()
+        for _ in range(entries_per_day):
+            order_id = rng.randrange(1, orders + 1) if orders else None
+            if rng.random() < 0.5:
+                name, role = rng.choice(masters), "Master"
+                work_type = rng.choice(["Marking", "Cutting"])
+            else:
+                name, role = rng.choice(tailors), "Tailor"
+                work_type = "Blouse Stitched"
+            work_rows.append((work_date, order_id, name, role, work_type, ""))
+    conn.executemany(
+        """
+        INSERT INTO worklog (work_date, order_id, staff_name, role, work_type, notes)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        work_rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+def _widget(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def _run(at, element=None, timeout=None):
+    """Rerun the app and raise ScriptError if the script raised."""
+    if element is None:
+        at.run(timeout=timeout)
+    else:
+        element.run(timeout=timeout)
+    if at.exception:
+        raise ScriptError(at.exception[0].message)
+
+
+def _submit(at, button, confirmation, timeout):
+    """Click a save button and check the app confirmed the write."""
+    _run(at, _widget(at.button, button).click(), timeout)
+    if not any(confirmation in s.value for s in at.success):
+        raise NotConfirmed(f"{button!r} gave no {confirmation!r} message")
+
+
+def _goto(at, page, timeout):
+    _run(at, at.radio[0].set_value(page), timeout)
+
+
+def action_new_order(at, rng, timeout):
+    _goto(at, "New Order", timeout)
+    number = f"LT-{rng.randrange(10**6)}"
+    _widget(at.text_input, "Order number (from slip)").input(number)
+    _widget(at.text_input, "Client name").input(f"Walk-in {number}")
+    _widget(at.text_input, "Phone").input(f"9{rng.randrange(10**9):09d}")
+    _widget(at.checkbox, "Needs dyeing?").set_value(rng.random() < 0.5)
+    _widget(at.checkbox, "Needs embroidery?").set_value(rng.random() < 0.3)
+    _submit(at, "Save Order", "saved", timeout)
+
+
+def action_update_stage(at, rng, timeout):
+    _goto(at, "Orders by Stage", timeout)
+    order = _widget(at.selectbox, "Select order")
+    _run(at, order.select_index(rng.randrange(len(order.options))), timeout)
+    stage = _widget(at.selectbox, "New stage")
+    stage.select_index(rng.randrange(len(stage.options)))
+    _submit(at, "Update Stage", "Stage updated", timeout)
+
+
+def action_log_work(at, rng, timeout):
+    _goto(at, "Log Work Done", timeout)
+    staff = _widget(at.selectbox, "Staff name")
+    staff.select_index(rng.randrange(len(staff.options)))
+    order = _widget(at.selectbox, "Order")
+    order.select_index(rng.randrange(len(order.options)))
+    _submit(at, "Save Work Entry", "Work logged", timeout)
+
+
+def action_dashboard(at, rng, timeout):
+    _goto(at, "Dashboard", timeout)
+
+
+def action_masters_performance(at, rng, timeout):
+    _goto(at, "Masters Performance", timeout)
+
+
+def action_tailors_performance(at, rng, timeout):
+    _goto(at, "Tailors Performance", timeout)
+
+
+ACTIONS = {
+    "new_order": action_new_order,
+    "update_stage": action_update_stage,
+    "log_work": action_log_work,
+    "dashboard": action_dashboard,
+    "masters_performance": action_masters_performance,
+    "tailors_performance": action_tailors_performance,
+}
+
+
+def classify_error(exc):
+    """Map an exception to one of 'lock', 'timeout', 'unconfirmed' or 'error'."""
+    if isinstance(exc, NotConfirmed):
+        return "unconfirmed"
+    message = str(exc).lower()
+    if "database is locked" in message or "database is busy" in message:
+        return "lock"
+    if isinstance(exc, (RuntimeError, TimeoutError)) and (
+        "timed out" in message or "timeout" in message
+    ):
+        return "timeout"
+    return "error"
+
+
+def run_session(session_id, db_path, actions, mix, seed, timeout):
+    """Run one simulated session; return a list of per-action samples."""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["BOUTIQUE_DB"] = db_path
+    rng = random.Random(seed + session_id)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    samples = []
+    try:
+        _run(at, timeout=timeout)
+    except Exception as exc:
+        samples.append(
+            {"action": "startup", "seconds": 0.0, "error": classify_error(exc),
+             "message": str(exc)}
+        )
+        return samples
+
+    for _ in range(actions):
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        error = message = None
+        try:
+            ACTIONS[name](at, rng, timeout)
+        except Exception as exc:
+            error, message = classify_error(exc), str(exc)
+            # start the next action from a clean session
+            at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+            try:
+                _run(at, timeout=timeout)
+            except Exception:
+                pass
+        samples.append(
+            {
+                "action": name,
+                "seconds": time.perf_counter() - started,
+                "error": error,
+                "message": message,
+            }
+        )
+    return samples
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (pct in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples, wall_seconds, config):
+    """Build the JSON-serialisable report from raw samples."""
+    per_action = {}
+    for sample in samples:
+        per_action.setdefault(sample["action"], []).append(sample)
+
+    actions = {}
+    for name, rows in sorted(per_action.items()):
+        ok = [r["seconds"] for r in rows if r["error"] is None]
+        actions[name] = {
+            "count": len(rows),
+            "ok": len(ok),
+            "lock_errors": sum(r["error"] == "lock" for r in rows),
+            "timeouts": sum(r["error"] == "timeout" for r in rows),
+            "unconfirmed": sum(r["error"] == "unconfirmed" for r in rows),
+            "errors": sum(r["error"] == "error" for r in rows),
+            "p50_ms": round(percentile(ok, 50) * 1000, 1) if ok else None,
+            "p99_ms": round(percentile(ok, 99) * 1000, 1) if ok else None,
+            "max_ms": round(max(ok) * 1000, 1) if ok else None,
+        }
+
+    messages = {}
+    for sample in samples:
+        if sample["message"]:
+            messages[sample["message"]] = messages.get(sample["message"], 0) + 1
+
+    completed = sum(s["error"] is None for s in samples)
+    return {
+        "config": config,
+        "wall_seconds": round(wall_seconds, 3),
+        "total_actions": len(samples),
+        "completed_actions": completed,
+        "throughput_per_sec": round(completed / wall_seconds, 2)
+        if wall_seconds > 0
+        else 0,
+        "lock_errors": sum(s["error"] == "lock" for s in samples),
+        "timeouts": sum(s["error"] == "timeout" for s in samples),
+        "unconfirmed": sum(s["error"] == "unconfirmed" for s in samples),
+        "errors": sum(s["error"] == "error" for s in samples),
+        "actions": actions,
+        "error_messages": messages,
+    }
+
+
+def run_load_test(
+    db_path="loadtest.db",
+    sessions=4,
+    actions=20,
+    mix=None,
+    mode="process",
+    orders=500,
+    days=60,
+    seed=0,
+    timeout=30,
+):
+    """Generate a database, run the sessions concurrently, return the report."""
+    mix = dict(mix or DEFAULT_MIX)
+    unknown = set(mix) - set(ACTIONS)
+    if unknown:
+        raise ValueError(f"Unknown actions in mix: {sorted(unknown)}")
+
+    db_path = os.path.abspath(db_path)
+    build_database(db_path, orders=orders, days=days, seed=seed)
+
+    config = {
+        "sessions": sessions,
+        "actions_per_session": actions,
+        "mix": mix,
+        "mode": mode,
+        "orders": orders,
+        "days": days,
+        "seed": seed,
+        "timeout": timeout,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    pool_cls = ProcessPoolExecutor if mode == "process" else ThreadPoolExecutor
+    started = time.perf_counter()
+    with pool_cls(max_workers=sessions) as pool:
+        futures = [
+            pool.submit(run_session, i, db_path, actions, mix, seed, timeout)
+            for i in range(sessions)
+        ]
+        samples = [s for f in futures for s in f.result()]
+    wall = time.perf_counter() - started
+
+    return summarize(samples, wall, config)
+
+
+def parse_mix(text):
+    """Parse 'log_work=5,dashboard=2' into a weights dict."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--actions", type=int, default=20,
+                        help="actions per session")
+    parser.add_argument(
+        "--mode",
+        choices=["thread", "process"],
+        default="process",
+        help="thread mode is unreliable: concurrent AppTests can drop submissions",
+    )
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help="e.g. log_work=5,update_stage=3,dashboard=2")
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--days", type=int, default=60,
+                        help="days of generated work log history")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30,
+                        help="seconds allowed per script run")
+    parser.add_argument("--db", default="loadtest.db")
+    parser.add_argument("--report", default=None,
+                        help="write JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_load_test(
+        db_path=args.db,
+        sessions=args.sessions,
+        actions=args.actions,
+        mix=args.mix,
+        mode=args.mode,
+        orders=args.orders,
+        days=args.days,
+        seed=args.seed,
+        timeout=args.timeout,
+    )
+
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
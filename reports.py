@@ -0,0 +1,188 @@
+"""Background report jobs (month-end piece-rate payroll).
+
+Heavy range reports run in a process-wide thread pool instead of the
+Streamlit script thread, so one session building a month's report does not
+hold up everyone else. Jobs are cached on (report, start, end, data version):
+reopening the same range is instant until new work is logged.
+"""
+
+import sqlite3
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pandas as pd
+
+MAX_WORKERS = 2
+MAX_CACHED_JOBS = 32
+CHUNK_DAYS = 7
+
+# Payroll column -> (role, work_type), counted as distinct orders per staff
+# like the performance tabs do
+PIECE_COLUMNS = {
+    "Markings": ("Master", "Marking"),
+    "Cuttings": ("Master", "Cutting"),
+    "Blouses Stitched": ("Tailor", "Blouse Stitched"),
+    "Embroidery": ("Embroidery", "Embroidery Done"),
+}
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="report")
+_lock = threading.Lock()
+_jobs = OrderedDict()  # (db, report, start, end, version) -> ReportJob
+
+
+class ReportJob:
+    """A report running (or finished) in the background pool."""
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "queued"  # queued / running / done / failed
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def data_version(db_path, start_date, end_date):
+    """Cheap fingerprint that changes when work in the range or staff changes.
+
+    Work entries are only ever appended, so count + max id is enough.
+    """
+    conn = _connect(db_path)
+    work = conn.execute(
+        "SELECT COUNT(*) AS c, MAX(id) AS m FROM worklog "
+        "WHERE work_date BETWEEN ? AND ?",
+        (start_date, end_date),
+    ).fetchone()
+    staff = conn.execute(
+        "SELECT group_concat("
+        "name || '|' || role || '|' || COALESCE(reports_to, '') || '|' || active, ','"
+        ") AS s "
+        "FROM (SELECT * FROM staff ORDER BY name)"
+    ).fetchone()
+    conn.close()
+    return f"{work['c']}:{work['m']}:{zlib.crc32((staff['s'] or '').encode())}"
+
+
+def payroll_report(db_path, start_date, end_date, progress=None):
+    """Per-staff piece counts for [start_date, end_date] inclusive.
+
+    Reads the range in CHUNK_DAYS windows (so progress can be reported) and
+    keeps the sets of distinct orders per staff / piece type.
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    days = (end - start).days + 1
+
+    conn = _connect(db_path)
+    pieces = {}  # (staff_name, column) -> set of order ids
+    wanted = {value: column for column, value in PIECE_COLUMNS.items()}
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=CHUNK_DAYS - 1), end)
+        rows = conn.execute(
+            """
+            SELECT DISTINCT staff_name, role, work_type, order_id FROM worklog
+            WHERE work_date BETWEEN ? AND ?
+            """,
+            (chunk_start.isoformat(), chunk_end.isoformat()),
+        )
+        for row in rows:
+            column = wanted.get((row["role"], row["work_type"]))
+            if column:
+                pieces.setdefault((row["staff_name"], column), set()).add(
+                    row["order_id"]
+                )
+        if progress:
+            progress(((chunk_end - start).days + 1) / days)
+        chunk_start = chunk_end + timedelta(days=1)
+
+    staff = {
+        row["name"]: row
+        for row in conn.execute("SELECT * FROM staff ORDER BY role, name")
+    }
+    conn.close()
+
+    names = [n for n, s in staff.items() if s["active"]]
+    names += sorted({name for name, _ in pieces} - set(names))
+
+    rows = []
+    for name in names:
+        s = staff.get(name)
+        counts = {c: len(pieces.get((name, c), ())) for c in PIECE_COLUMNS}
+        rows.append(
+            {
+                "Staff": name,
+                "Role": s["role"] if s else "",
+                "Reports To": s["reports_to"] if s else "",
+                **counts,
+                "Total Pieces": sum(counts.values()),
+                "Range": f"{start_date} → {end_date}",
+                "Days": days,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+REPORTS = {
+    "payroll": payroll_report,
+}
+
+
+def _run_job(job, db_path, report, start_date, end_date):
+    def set_progress(value):
+        job.progress = value
+
+    job.status = "running"
+    try:
+        job.result = REPORTS[report](db_path, start_date, end_date, set_progress)
+    except Exception as e:
+        job.error = str(e)
+        job.status = "failed"
+    else:
+        job.progress = 1.0
+        job.status = "done"
+
+
+def submit_report(db_path, report, start_date, end_date):
+    """Start a report in the background, or return the cached / running job."""
+    version = data_version(db_path, start_date, end_date)
+    key = (db_path, report, start_date, end_date, version)
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and job.status != "failed":
+            _jobs.move_to_end(key)
+            return job
+
+        job = ReportJob(key)
+        _jobs[key] = job
+        # evict the oldest finished jobs; running ones are still being polled
+        finished = [k for k, j in _jobs.items() if j.finished]
+        for old_key in finished[: max(0, len(_jobs) - MAX_CACHED_JOBS)]:
+            del _jobs[old_key]
+        job.future = _executor.submit(
+            _run_job, job, db_path, report, start_date, end_date
+        )
+    return job
+
+
+def get_job(job_id):
+    with _lock:
+        for job in _jobs.values():
+            if job.id == job_id:
+                return job
+    return None
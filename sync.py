@@ -0,0 +1,277 @@
+"""Sync between a terminal's local replica and the central database.
+
+Terminals (BOUTIQUE_TERMINAL set) write to their own SQLite replica and queue
+each write in its outbox. A sync pushes the outbox to the central DB in
+batches, then pulls back orders changed since the last pull and the staff
+list. Both sides are plain SQLite files, so sync can be run locally:
+
+    python sync.py --replica tablet1.db --central boutique.db
+
+Rules:
+- every change has a unique change_id; the central DB records applied ids,
+  so re-sending a batch (e.g. after a dropped connection) is a no-op
+- order field updates (stage, tailor) are last-writer-wins per field by
+  (changed_at, device_id), so the later of two stage updates sticks
+- orders are pulled by orders.row_version, staff is small and pulled whole;
+  orders whose terminal update lost are re-fetched so the terminal converges
+"""
+
+import argparse
+import json
+import sqlite3
+from datetime import datetime
+
+BATCH_SIZE = 200
+
+# Order fields a terminal may change
+SYNCED_ORDER_FIELDS = ("current_stage", "tailor_assigned")
+
+# Bumps orders.row_version to a new highest value inside the same statement
+NEXT_ROW_VERSION = "(SELECT COALESCE(MAX(row_version), 0) + 1 FROM orders)"
+
+
+def connect(path, timeout=5.0):
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def now_str():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def get_state(conn, key, default=None):
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def set_state(conn, key, value):
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+        (key, str(value)),
+    )
+
+
+def sync_status(conn):
+    """Pending outbox size and last successful sync time of a replica."""
+    pending = conn.execute("SELECT COUNT(*) AS c FROM outbox").fetchone()["c"]
+    return {"pending": pending, "last_sync": get_state(conn, "last_sync")}
+
+
+def apply_set_field(central, change, payload):
+    """Apply one order field update if it is newer than what central has."""
+    field = payload["field"]
+    if field not in SYNCED_ORDER_FIELDS:
+        return False
+
+    order = central.execute(
+        "SELECT last_updated FROM orders WHERE id = ?", (change["order_id"],)
+    ).fetchone()
+    if order is None:
+        return False
+
+    clock = central.execute(
+        "SELECT changed_at, device_id FROM order_field_clock "
+        "WHERE order_id = ? AND field = ?",
+        (change["order_id"], field),
+    ).fetchone()
+    if clock is not None:
+        current = (clock["changed_at"], clock["device_id"])
+    else:
+        # field never stamped (older rows): fall back to the row timestamp
+        current = (order["last_updated"] or "", "")
+
+    if (change["changed_at"], change["device_id"]) <= current:
+        return False
+
+    central.execute(
+        f"UPDATE orders SET {field} = ?, last_updated = ?, "
+        f"row_version = {NEXT_ROW_VERSION} WHERE id = ?",
+        (payload["value"], change["changed_at"], change["order_id"]),
+    )
+    central.execute(
+        """
+        INSERT OR REPLACE INTO order_field_clock (order_id, field, changed_at, device_id)
+        VALUES (?, ?, ?, ?)
+        """,
+        (change["order_id"], field, change["changed_at"], change["device_id"]),
+    )
+    return True
+
+
+def apply_log_work(central, change, payload):
+    central.execute(
+        """
+        INSERT INTO worklog (work_date, order_id, staff_name, role, work_type, notes)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            payload["work_date"],
+            change["order_id"],
+            payload["staff_name"],
+            payload["role"],
+            payload["work_type"],
+            payload["notes"],
+        ),
+    )
+    return True
+
+
+APPLIERS = {
+    "set_field": apply_set_field,
+    "log_work": apply_log_work,
+}
+
+
+def apply_changes(central, changes):
+    """Apply a batch of outbox rows to central in one transaction.
+
+    Returns (number of changes that changed central data, ids of orders whose
+    field updates were not applied). The terminal must re-fetch those orders:
+    central kept a newer value that is already under its pull watermark.
+    """
+    applied = 0
+    not_applied = set()
+    applied_at = now_str()
+    try:
+        for change in changes:
+            cur = central.execute(
+                "INSERT OR IGNORE INTO applied_changes (change_id, applied_at) "
+                "VALUES (?, ?)",
+                (change["change_id"], applied_at),
+            )
+            # rowcount 0: already applied by an earlier, interrupted sync
+            apply = APPLIERS.get(change["op"]) if cur.rowcount else None
+            if apply and apply(central, change, json.loads(change["payload"])):
+                applied += 1
+            elif change["op"] == "set_field":
+                not_applied.add(change["order_id"])
+        central.commit()
+    except Exception:
+        central.rollback()
+        raise
+    return applied, not_applied
+
+
+def push(replica, central, batch_size=BATCH_SIZE):
+    """Ship the replica's outbox to central; return number of changes sent.
+
+    Orders whose field updates central rejected are remembered in sync_state
+    (in the same transaction that drops the batch) for pull_orders to re-fetch.
+    """
+    sent = 0
+    while True:
+        changes = replica.execute(
+            "SELECT * FROM outbox ORDER BY seq LIMIT ?", (batch_size,)
+        ).fetchall()
+        if not changes:
+            return sent
+        _, not_applied = apply_changes(central, changes)
+        if not_applied:
+            refetch = set(json.loads(get_state(replica, "refetch_orders", "[]")))
+            refetch |= not_applied
+            set_state(replica, "refetch_orders", json.dumps(sorted(refetch)))
+        # only forget the batch once central has committed it
+        replica.execute("DELETE FROM outbox WHERE seq <= ?", (changes[-1]["seq"],))
+        replica.commit()
+        sent += len(changes)
+
+
+def pull_orders(replica, central):
+    """Copy orders changed on central since the last pull into the replica.
+
+    Orders queued for re-fetch by push are copied regardless of the watermark.
+    """
+    # no watermark yet: full pull
+    since = int(get_state(replica, "orders_version", -1))
+    rows = central.execute(
+        "SELECT * FROM orders WHERE row_version > ? ORDER BY row_version", (since,)
+    ).fetchall()
+    new_version = rows[-1]["row_version"] if rows else None
+    refetch = json.loads(get_state(replica, "refetch_orders", "[]"))
+    seen = {r["id"] for r in rows}
+    missing = [order_id for order_id in refetch if order_id not in seen]
+    if missing:
+        rows += central.execute(
+            "SELECT * FROM orders WHERE id IN ({})".format(
+                ", ".join("?" for _ in missing)
+            ),
+            missing,
+        ).fetchall()
+    if refetch:
+        set_state(replica, "refetch_orders", "[]")
+    if not rows:
+        replica.commit()
+        return 0
+
+    # don't clobber local edits that were made after the push
+    pending = {
+        r["order_id"]
+        for r in replica.execute(
+            "SELECT DISTINCT order_id FROM outbox WHERE op = 'set_field'"
+        )
+    }
+    cols = rows[0].keys()
+    sql = "INSERT OR REPLACE INTO orders ({}) VALUES ({})".format(
+        ", ".join(cols), ", ".join("?" for _ in cols)
+    )
+    replica.executemany(
+        sql, [tuple(r) for r in rows if r["id"] not in pending]
+    )
+    if new_version is not None and not pending.intersection(r["id"] for r in rows):
+        set_state(replica, "orders_version", new_version)
+    replica.commit()
+    return len(rows)
+
+
+def pull_staff(replica, central):
+    """Make the replica's staff table match central; return rows changed."""
+    remote = {r["name"]: tuple(r) for r in central.execute("SELECT * FROM staff")}
+    local = {r["name"]: tuple(r) for r in replica.execute("SELECT * FROM staff")}
+
+    changed = [row for name, row in remote.items() if local.get(name) != row]
+    removed = [(name,) for name in local if name not in remote]
+    if changed:
+        replica.executemany(
+            "INSERT OR REPLACE INTO staff (name, role, reports_to, active) "
+            "VALUES (?, ?, ?, ?)",
+            changed,
+        )
+    if removed:
+        replica.executemany("DELETE FROM staff WHERE name = ?", removed)
+    replica.commit()
+    return len(changed) + len(removed)
+
+
+def sync(replica_path, central_path, batch_size=BATCH_SIZE, timeout=5.0):
+    """Push the replica's outbox, then pull order/staff deltas."""
+    replica = connect(replica_path)
+    central = connect(central_path, timeout=timeout)
+    try:
+        pushed = push(replica, central, batch_size)
+        orders = pull_orders(replica, central)
+        staff = pull_staff(replica, central)
+        set_state(replica, "last_sync", now_str())
+        replica.commit()
+    finally:
+        central.close()
+        replica.close()
+    return {"pushed": pushed, "orders": orders, "staff": staff}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync a terminal replica.")
+    parser.add_argument("--replica", required=True, help="terminal's local DB")
+    parser.add_argument("--central", required=True, help="central boutique.db")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    import app
+
+    app.init_db(args.replica)
+    app.init_db(args.central)
+    print(sync(args.replica, args.central, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Payroll report counts and the range-keyed job cache."""
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("pandas")
+
+import app  # noqa: E402
+import reports  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "boutique.db")
+    monkeypatch.setattr(app, "DB_PATH", path)
+    monkeypatch.setattr(app, "TERMINAL_ID", None)
+    app.init_db()
+    app.seed_staff()
+    return path
+
+
+def row_for(df, name):
+    return df[df["Staff"] == name].iloc[0]
+
+
+def submit(db, start="2026-10-01", end="2026-10-31"):
+    job = reports.submit_report(db, "payroll", start, end)
+    job.future.result()
+    return job
+
+
+def test_distinct_orders_across_chunks_like_performance_tabs(db):
+    # same order on day 1 and day 10 (different CHUNK_DAYS windows)
+    app.log_work("2026-10-01", 1, "Hassan", "Master", "Marking", "")
+    app.log_work("2026-10-10", 1, "Hassan", "Master", "Marking", "")
+    app.log_work("2026-10-10", 2, "Hassan", "Master", "Marking", "")
+    app.log_work("2026-10-03", 1, "Hassan", "Master", "Cutting", "")
+    # entries without an order count once, as .unique() keeps NaN
+    app.log_work("2026-10-02", None, "Aslam", "Tailor", "Blouse Stitched", "")
+    app.log_work("2026-10-20", None, "Aslam", "Tailor", "Blouse Stitched", "")
+    app.log_work("2026-10-20", 5, "Aslam", "Tailor", "Blouse Stitched", "")
+    # outside the range
+    app.log_work("2026-11-01", 3, "Hassan", "Master", "Marking", "")
+
+    df = reports.payroll_report(db, "2026-10-01", "2026-10-31")
+
+    work = app.get_work_in_range("2026-10-01", "2026-10-31")
+    hassan = work[(work["staff_name"] == "Hassan") & (work["role"] == "Master")]
+    aslam = work[(work["staff_name"] == "Aslam") & (work["role"] == "Tailor")]
+    expected_markings = len(
+        hassan[hassan["work_type"] == "Marking"]["order_id"].unique()
+    )
+    expected_blouses = len(
+        aslam[aslam["work_type"] == "Blouse Stitched"]["order_id"].unique()
+    )
+
+    assert row_for(df, "Hassan")["Markings"] == expected_markings == 2
+    assert row_for(df, "Hassan")["Cuttings"] == 1
+    assert row_for(df, "Aslam")["Blouses Stitched"] == expected_blouses == 2
+    assert row_for(df, "Hassan")["Total Pieces"] == 3
+    assert row_for(df, "Hassan")["Days"] == 31
+
+
+def test_unchanged_range_is_a_cache_hit(db):
+    app.log_work("2026-10-05", 1, "Hassan", "Master", "Marking", "")
+    job = submit(db)
+
+    assert reports.submit_report(db, "payroll", "2026-10-01", "2026-10-31") is job
+
+    # work outside the range doesn't invalidate it
+    app.log_work("2026-11-05", 2, "Hassan", "Master", "Marking", "")
+    assert reports.submit_report(db, "payroll", "2026-10-01", "2026-10-31") is job
+
+
+def test_new_work_in_range_invalidates_cache(db):
+    app.log_work("2026-10-05", 1, "Hassan", "Master", "Marking", "")
+    job = submit(db)
+
+    app.log_work("2026-10-06", 2, "Hassan", "Master", "Marking", "")
+    fresh = submit(db)
+
+    assert fresh is not job
+    assert row_for(fresh.result, "Hassan")["Markings"] == 2
+
+
+def test_reports_to_change_invalidates_cache(db):
+    app.log_work("2026-10-05", 1, "Aslam", "Tailor", "Blouse Stitched", "")
+    job = submit(db)
+    assert row_for(job.result, "Aslam")["Reports To"] == "Hassan"
+
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE staff SET reports_to = 'Shameen' WHERE name = 'Aslam'")
+    conn.commit()
+    conn.close()
+    fresh = submit(db)
+
+    assert fresh is not job
+    assert row_for(fresh.result, "Aslam")["Reports To"] == "Shameen"
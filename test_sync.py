@@ -0,0 +1,204 @@
+"""Sync between a terminal replica and the central DB, using two local files."""
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("pandas")
+
+import app  # noqa: E402
+import sync  # noqa: E402
+
+
+def make_order(number):
+    app.insert_order(
+        number, f"Client {number}", "", "2026-10-01", "2026-10-20",
+        False, False, False, "Hassan", None, "",
+    )
+
+
+def stages(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT order_number, current_stage FROM orders").fetchall()
+    conn.close()
+    return dict(rows)
+
+
+@pytest.fixture
+def central(tmp_path, monkeypatch):
+    path = str(tmp_path / "central.db")
+    monkeypatch.setattr(app, "DB_PATH", path)
+    monkeypatch.setattr(app, "TERMINAL_ID", None)
+    app.init_db()
+    app.seed_staff()
+    return path
+
+
+def as_terminal(monkeypatch, path, device):
+    monkeypatch.setattr(app, "DB_PATH", path)
+    monkeypatch.setattr(app, "TERMINAL_ID", device)
+    app.init_db()
+
+
+def set_outbox_time(path, changed_at):
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE outbox SET changed_at = ?", (changed_at,))
+    conn.commit()
+    conn.close()
+
+
+def set_clock(path, field, changed_at):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "UPDATE order_field_clock SET changed_at = ? WHERE field = ?",
+        (changed_at, field),
+    )
+    conn.commit()
+    conn.close()
+
+
+def conn_with_timeout(path):
+    conn = sqlite3.connect(path, timeout=0.1)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_pre_migration_orders_reach_terminal(tmp_path, monkeypatch):
+    # central DB with the schema from before row_version existed
+    path = str(tmp_path / "central.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_number TEXT, client_name TEXT, phone TEXT,
+            order_date TEXT, due_date TEXT,
+            needs_dyeing INTEGER, needs_embroidery INTEGER, needs_market INTEGER,
+            master_assigned TEXT, tailor_assigned TEXT,
+            current_stage TEXT, comments TEXT, last_updated TEXT
+        )
+        """
+    )
+    conn.execute(
+        "INSERT INTO orders (order_number, client_name, current_stage, last_updated) "
+        "VALUES ('OLD-1', 'Old client', 'Lining', '2026-01-01T10:00:00')"
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(app, "DB_PATH", path)
+    monkeypatch.setattr(app, "TERMINAL_ID", None)
+    app.init_db()
+    app.seed_staff()
+    make_order("NEW-1")
+
+    replica = str(tmp_path / "tablet.db")
+    app.init_db(replica)
+    sync.sync(replica, path)
+
+    assert stages(replica) == {"OLD-1": "Lining", "NEW-1": "With Mom"}
+
+
+def test_later_stage_update_wins_and_work_is_sent_once(
+    central, tmp_path, monkeypatch
+):
+    make_order("1")
+    t1, t2 = str(tmp_path / "t1.db"), str(tmp_path / "t2.db")
+    for path in (t1, t2):
+        app.init_db(path)
+        sync.sync(path, central)
+
+    as_terminal(monkeypatch, t1, "t1")
+    app.update_order_stage(1, "With Dad")
+    app.log_work("2026-10-19", 1, "Hassan", "Master", "Marking", "")
+    as_terminal(monkeypatch, t2, "t2")
+    app.update_order_stage(1, "Lining")
+
+    set_outbox_time(t1, "2026-10-19T10:00:00")
+    set_outbox_time(t2, "2026-10-19T11:00:00")
+
+    # t2 syncs first, then the older t1 change arrives and must lose
+    sync.sync(t2, central)
+    conn = sqlite3.connect(t1)
+    outbox = conn.execute("SELECT * FROM outbox").fetchall()
+    conn.close()
+    sync.sync(t1, central)
+    sync.sync(t2, central)
+
+    assert stages(central) == stages(t1) == stages(t2) == {"1": "Lining"}
+
+    # re-sending an already applied batch is a no-op
+    central_conn = sqlite3.connect(central)
+    central_conn.row_factory = sqlite3.Row
+    conn = sqlite3.connect(t1)
+    conn.row_factory = sqlite3.Row
+    resent = conn.execute("SELECT * FROM outbox").fetchall()
+    conn.close()
+    assert resent == []
+    keys = ["seq", "change_id", "device_id", "op", "order_id", "payload", "changed_at"]
+    sync.apply_changes(central_conn, [dict(zip(keys, row)) for row in outbox])
+    count = central_conn.execute("SELECT COUNT(*) FROM worklog").fetchone()[0]
+    central_conn.close()
+    assert count == 1
+
+
+def test_terminal_converges_when_its_update_loses(central, tmp_path, monkeypatch):
+    make_order("1")
+    tablet = str(tmp_path / "tablet.db")
+    app.init_db(tablet)
+
+    # front desk sets the stage with a later clock than the tablet's change
+    app.update_order_stage(1, "Lining")
+    set_clock(central, "current_stage", "2026-10-19T11:00:00")
+    sync.sync(tablet, central)
+
+    as_terminal(monkeypatch, tablet, "t1")
+    app.update_order_stage(1, "Delivered")
+    set_outbox_time(tablet, "2026-10-19T10:00:00")
+    sync.sync(tablet, central)
+    sync.sync(tablet, central)
+
+    assert stages(central) == stages(tablet) == {"1": "Lining"}
+
+
+def test_stage_update_not_blocked_by_tailor_edit(central, tmp_path, monkeypatch):
+    make_order("1")
+    tablet = str(tmp_path / "tablet.db")
+    app.init_db(tablet)
+    sync.sync(tablet, central)
+
+    # front desk changes the tailor at 11:00; the stage was last set at 09:00
+    app.update_order_tailor(1, "Aslam")
+    set_clock(central, "current_stage", "2026-10-19T09:00:00")
+    set_clock(central, "tailor_assigned", "2026-10-19T11:00:00")
+    conn = sqlite3.connect(central)
+    conn.execute("UPDATE orders SET last_updated = '2026-10-19T11:00:00'")
+    conn.commit()
+    conn.close()
+
+    as_terminal(monkeypatch, tablet, "t1")
+    app.update_order_stage(1, "Master Marking")
+    set_outbox_time(tablet, "2026-10-19T10:30:00")
+    sync.sync(tablet, central)
+
+    assert stages(central) == {"1": "Master Marking"}
+
+
+def test_init_db_does_not_write_when_up_to_date(central, monkeypatch):
+    make_order("1")
+    app.init_db()
+
+    # another connection holds the write lock; init_db must not wait for it
+    other = sqlite3.connect(central)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        monkeypatch.setattr(
+            app,
+            "get_conn",
+            lambda path=None: conn_with_timeout(path or app.DB_PATH),
+        )
+        app.init_db()
+    finally:
+        other.rollback()
+        other.close()